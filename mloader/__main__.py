@@ -179,6 +179,14 @@ Examples:
     show_default=True,
     help="Include chapter titles in filenames",
 )
+@click.option(
+    "--cbz-compresslevel",
+    type=click.IntRange(min=0, max=9),
+    default=6,
+    show_default=True,
+    help="Deflate level for non-JPEG/PNG entries in CBZ archives",
+    envvar="MLOADER_CBZ_COMPRESSLEVEL",
+)
 @click.argument("urls", nargs=-1, callback=validate_urls, expose_value=False)
 @click.pass_context
 def main(
@@ -191,6 +199,7 @@ def main(
     end: int,
     last: bool,
     chapter_title: bool,
+    cbz_compresslevel: int,
     chapters: Optional[Set[int]] = None,
     titles: Optional[Set[int]] = None,
 ):
@@ -201,8 +210,15 @@ def main(
     end = end or float("inf")
     log.info("Started export")
 
+    exporter_kwargs = {}
+    if issubclass(exporter, CBZExporter):
+        exporter_kwargs["compresslevel"] = cbz_compresslevel
+
     exporter = partial(
-        exporter, destination=out_dir, add_chapter_title=chapter_title
+        exporter,
+        destination=out_dir,
+        add_chapter_title=chapter_title,
+        **exporter_kwargs,
     )
 
     loader = MangaLoader(exporter, quality, split)
@@ -1,10 +1,12 @@
-from io import BytesIO
+import os
+import tempfile
+import time
 import zipfile
 from abc import ABCMeta, abstractmethod
 from itertools import chain
 from pathlib import Path
-from typing import Union, Optional
-from PIL import Image
+from typing import List, Tuple, Union, Optional
+from PIL import Image, PdfParser
 import io
 from datetime import date, datetime
 
@@ -14,8 +16,39 @@ from mloader.utils import beautify_path, is_oneshot, chapter_name_to_int
 from mloader.__version__ import __title__, __version__
 
 
+# Signatures of image formats that are already compressed
+COMPRESSED_IMAGE_SIGNATURES = (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n")
+
+# Pillow image mode: pdf color space and procset
+PDF_COLOR_SPACES = {
+    "L": ("DeviceGray", "ImageB"),
+    "RGB": ("DeviceRGB", "ImageC"),
+    "CMYK": ("DeviceCMYK", "ImageC"),
+}
+
+WRITE_FLAGS = (
+    os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+)
+
+# Read the umask once, changing it later could race with other threads
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+# Uniquely named temporary file next to path, with the permissions a regular
+# open() would have given it
+def create_part_file(path: Path) -> Tuple[int, str]:
+    fd, part_path = tempfile.mkstemp(
+        dir=path.parent, prefix=path.name + ".", suffix=".part"
+    )
+    os.chmod(part_path, 0o666 & ~UMASK)
+    return fd, part_path
+
+
 class ExporterBase(metaclass=ABCMeta):
     FORMAT_REGISTRY = {}
+    # Evaluated once per run instead of for every chapter
+    _CURRENT_YEAR = datetime.today().year
 
     def __init__(
         self,
@@ -51,6 +84,9 @@ class ExporterBase(metaclass=ABCMeta):
         self.chapter_name = " ".join(
             (self._chapter_prefix, self._chapter_suffix)
         )
+        # Only the page number differs between page names of a chapter
+        self._page_name_prefix = f"{self._chapter_prefix} - "
+        self._page_name_suffix = f" {self._chapter_suffix}."
 
     def _is_extra(self, chapter_name: str) -> bool:
         return chapter_name.strip("#") == "ex"
@@ -87,9 +123,10 @@ class ExporterBase(metaclass=ABCMeta):
             chapter_num = beautify_path(chapter_name)
 
         components.append(f"{prefix}{chapter_num:0>3}{suffix}")
-        self.pub_year = datetime.fromtimestamp(start_timestamp).year
-        if self.pub_year <= datetime.today().year:
-            components.append(f"({self.pub_year})")
+        pub_year = time.localtime(start_timestamp).tm_year
+        self.pub_year = pub_year
+        if pub_year <= self._CURRENT_YEAR:
+            components.append(f"({pub_year})")
         components.append("(web)")
         return " ".join(components)
 
@@ -102,13 +139,20 @@ class ExporterBase(metaclass=ABCMeta):
         else:
             page = f"p{page:0>3}"
 
-        ext = ext.lstrip(".")
-
-        return f"{self._chapter_prefix} - {page} {self._chapter_suffix}.{ext}"
+        return (
+            self._page_name_prefix
+            + page
+            + self._page_name_suffix
+            + ext.lstrip(".")
+        )
 
     def close(self):
         pass
 
+    # Called instead of close() when the chapter download fails
+    def abort(self):
+        pass
+
     def __init_subclass__(cls, **kwargs) -> None:
         cls.FORMAT_REGISTRY[cls.format] = cls
         return super().__init_subclass__(**kwargs)
@@ -134,37 +178,81 @@ class RawExporter(ExporterBase):
         super().__init__(*args, **kwargs)
         self.path = Path(self.destination, self.title_name, self.chapter_name)
         self.path.mkdir(parents=True, exist_ok=True)
+        self._path_prefix = str(self.path) + os.sep
+        # skip_image and add_image are called for the same page in a row
+        self._page_paths = {}
+
+    def _page_path(self, index: Union[int, range]) -> str:
+        page_path = self._page_paths.get(index)
+        if page_path is None:
+            page_path = self._path_prefix + self.format_page_name(index)
+            self._page_paths[index] = page_path
+        return page_path
 
     def add_image(self, image_data: bytes, index: Union[int, range]):
-        filename = Path(self.format_page_name(index))
-        self.path.joinpath(filename).write_bytes(image_data)
+        # Page data is already a single blob, write it without buffering
+        fd = os.open(self._page_path(index), WRITE_FLAGS, 0o666)
+        try:
+            view = memoryview(image_data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
 
     def skip_image(self, index: Union[int, range]) -> bool:
-        filename = Path(self.format_page_name(index))
-        return self.path.joinpath(filename).exists()
+        return os.path.exists(self._page_path(index))
 
 
 class CBZExporter(ExporterBase):
     format = "cbz"
 
-    def __init__(self, compression=zipfile.ZIP_DEFLATED, *args, **kwargs):
+    def __init__(
+        self,
+        compression=zipfile.ZIP_DEFLATED,
+        compresslevel: int = 6,
+        *args,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
+        self.compresslevel = compresslevel
         self.path = Path(self.destination, self.title_name)
         self.path.mkdir(parents=True, exist_ok=True)
         full_path = self.destination + "/" + self.title_name + "/" + self.chapter_name + ".cbz"
         self.path = Path(full_path)
         self.skip_all_images = self.path.exists()
-        # To avoid partially downloaded file
-        self.archive_buffer = BytesIO()
+        if self.skip_all_images:
+            return
+        # To avoid partially downloaded file, write to a temporary file in
+        # the same directory and move it into place on close
+        fd, self.part_path = create_part_file(self.path)
+        self.archive_file = os.fdopen(fd, "wb")
         self.archive = zipfile.ZipFile(
-            self.archive_buffer, mode="w", compression=compression, compresslevel=9
+            self.archive_file,
+            mode="w",
+            compression=compression,
+            compresslevel=self.compresslevel,
         )
+        # Every page of the archive shares the same timestamp
+        self._date_time = time.localtime(time.time())[:6]
+        self._arcname_prefix = self.chapter_name.replace("\\", "/") + "/"
 
     def add_image(self, image_data: bytes, index: Union[int, range]):
         if self.skip_all_images:
             return
-        path = Path(self.chapter_name, self.format_page_name(index))
-        self.archive.writestr(path.as_posix(), image_data)
+        arcname = self._arcname_prefix + self.format_page_name(index)
+        zinfo = zipfile.ZipInfo(arcname, date_time=self._date_time)
+        zinfo.external_attr = 0o600 << 16
+        if image_data.startswith(COMPRESSED_IMAGE_SIGNATURES):
+            # Deflating jpeg/png data costs cpu time for no size benefit
+            compress_type = zipfile.ZIP_STORED
+        else:
+            compress_type = self.archive.compression
+        self.archive.writestr(
+            zinfo,
+            image_data,
+            compress_type=compress_type,
+            compresslevel=self.compresslevel,
+        )
 
     def skip_image(self, index: Union[int, range]) -> bool:
         return self.skip_all_images
@@ -172,12 +260,34 @@ class CBZExporter(ExporterBase):
     def close(self):
         if self.skip_all_images:
             return
-        self.archive.close()
-        self.path.write_bytes(self.archive_buffer.getvalue())
+        try:
+            self.archive.close()
+            self.archive_file.close()
+            os.replace(self.part_path, self.path)
+        except BaseException:
+            self._remove_part_file()
+            raise
+
+    def abort(self):
+        if self.skip_all_images:
+            return
+        try:
+            self.archive.close()
+        finally:
+            self._remove_part_file()
+
+    def _remove_part_file(self):
+        self.archive_file.close()
+        try:
+            os.remove(self.part_path)
+        except FileNotFoundError:
+            pass
 
 
 class PDFExporter(ExporterBase):
     format = "pdf"
+    app_name = f"{__title__} - {__version__}"
+    resolution = 100.0
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -186,29 +296,105 @@ class PDFExporter(ExporterBase):
         full_path = self.destination + "/" + self.title_name + "/" + self.chapter_name + ".pdf"
         self.path = Path(full_path)
         self.skip_all_images = self.path.exists()
-        self.images = []
+        # Keep raw page data only, images are decoded when saving
+        self._image_bytes: List[bytes] = []
 
     def add_image(self, image_data: bytes, index: Union[int, range]):
         if self.skip_all_images:
             return
-        self.images.append(Image.open(io.BytesIO(image_data)))
+        self._image_bytes.append(image_data)
 
     def skip_image(self, index: Union[int, range]) -> bool:
         return self.skip_all_images
 
+    def _encode_page(
+        self, image_data: bytes
+    ) -> Tuple[str, Tuple[int, int], bytes]:
+        with io.BytesIO(image_data) as stream, Image.open(stream) as image:
+            # Opening only reads the header, jpeg pages go into the pdf as
+            # they are, without being decoded and encoded again
+            if image.format == "JPEG" and image.mode in ("L", "RGB"):
+                return image.mode, image.size, image_data
+            # Other pages are decoded, and released together with the stream
+            if image.mode not in PDF_COLOR_SPACES:
+                image = image.convert("RGB")
+            with io.BytesIO() as encoded:
+                image.save(encoded, "JPEG")
+                return image.mode, image.size, encoded.getvalue()
+
+    def _write_page(
+        self,
+        pdf: PdfParser.PdfParser,
+        page_ref: PdfParser.IndirectReference,
+        image_data: bytes,
+    ):
+        mode, (width, height), stream = self._encode_page(image_data)
+        color_space, procset = PDF_COLOR_SPACES[mode]
+        image_ref = pdf.write_obj(
+            None,
+            stream=stream,
+            Type=PdfParser.PdfName("XObject"),
+            Subtype=PdfParser.PdfName("Image"),
+            Width=width,
+            Height=height,
+            Filter=PdfParser.PdfName("DCTDecode"),
+            BitsPerComponent=8,
+            ColorSpace=PdfParser.PdfName(color_space),
+            # Pillow writes Adobe style, inverted CMYK jpegs
+            Decode=[1, 0] * 4 if mode == "CMYK" else None,
+        )
+
+        page_width = width * 72.0 / self.resolution
+        page_height = height * 72.0 / self.resolution
+        contents_ref = pdf.write_obj(
+            None,
+            stream=b"q %f 0 0 %f 0 0 cm /image Do Q\n"
+            % (page_width, page_height),
+        )
+        pdf.write_page(
+            page_ref,
+            Resources=PdfParser.PdfDict(
+                ProcSet=[PdfParser.PdfName("PDF"), PdfParser.PdfName(procset)],
+                XObject=PdfParser.PdfDict(image=image_ref),
+            ),
+            MediaBox=[0, 0, page_width, page_height],
+            Contents=contents_ref,
+        )
+
+    def _write_pdf(self, path: str):
+        # All pages go through a single PdfParser session: one decoded page in
+        # memory at a time and no incremental updates of the page tree
+        with PdfParser.PdfParser(filename=path, mode="w+b") as pdf:
+            now = time.gmtime()
+            pdf.info.update(
+                Title=self.chapter_name,
+                Producer=self.app_name,
+                Creator=self.app_name,
+                CreationDate=now,
+                ModDate=now,
+            )
+            pdf.start_writing()
+            pdf.write_header()
+            pdf.write_comment(f"created by {self.app_name}")
+            # The page tree is written first, so the page objects need
+            # their ids upfront
+            pdf.pages = [pdf.next_object_id(0) for _ in self._image_bytes]
+            pdf.write_catalog()
+            for page_ref, image_data in zip(pdf.pages, self._image_bytes):
+                self._write_page(pdf, page_ref, image_data)
+            pdf.write_xref_and_trailer()
+
     def close(self):
-        if self.skip_all_images or not self.images:
+        if self.skip_all_images or not self._image_bytes:
             return
 
-        app_name = f"{__title__} - {__version__}"
-
-        self.images[0].save(
-            self.path,
-            "PDF",
-            resolution=100.0,
-            save_all=True,
-            append_images=self.images[1:],
-            title=self.chapter_name,
-            producer=app_name,
-            creator=app_name,
-        )
+        fd, part_path = create_part_file(self.path)
+        os.close(fd)
+        try:
+            self._write_pdf(part_path)
+            os.replace(part_path, self.path)
+        except BaseException:
+            os.remove(part_path)
+            raise
+        finally:
+            self._image_bytes = []
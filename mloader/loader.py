@@ -1,6 +1,7 @@
 import logging
 import re
 from collections import namedtuple
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
 from functools import lru_cache
 from itertools import chain, count
 from typing import Union, Dict, Set, Collection, Optional, Callable
@@ -136,8 +137,9 @@ class MangaLoader:
 
         return mangas
 
-    def _download(self, manga_list: MangaList):
+    def _download(self, manga_list: MangaList, executor: Executor):
         manga_num = len(manga_list)
+        pending_close: Optional[Future] = None
         for title_index, (title_id, chapters) in enumerate(
             manga_list.items(), 1
         ):
@@ -172,19 +174,38 @@ class MangaLoader:
                     p.manga_page for p in viewer.pages if p.manga_page.image_url
                 ]
 
-                with click.progressbar(
-                    pages, label=chapter_name, show_pos=True
-                ) as pbar:
-                    page_counter = count()
-                    for page_index, page in zip(page_counter, pbar):
-                        if PageType(page.type) == PageType.double:
-                            page_index = range(page_index, next(page_counter))
-                        if not exporter.skip_image(page_index):
-                            # Todo use asyncio + async requests 3
-                            image_blob = self._download_image(page.image_url)
-                            exporter.add_image(image_blob, page_index)
-
-                exporter.close()
+                try:
+                    with click.progressbar(
+                        pages, label=chapter_name, show_pos=True
+                    ) as pbar:
+                        page_counter = count()
+                        for page_index, page in zip(page_counter, pbar):
+                            if PageType(page.type) == PageType.double:
+                                page_index = range(
+                                    page_index, next(page_counter)
+                                )
+                            if not exporter.skip_image(page_index):
+                                # Todo use asyncio + async requests 3
+                                image_blob = self._download_image(
+                                    page.image_url
+                                )
+                                exporter.add_image(image_blob, page_index)
+
+                    # Chapters are written in the background while the next
+                    # one downloads. Wait for the previous chapter first, so
+                    # only one finished chapter is held in memory. Its errors
+                    # therefore surface one chapter late, once this chapter
+                    # has been downloaded.
+                    if pending_close is not None:
+                        pending_close.result()
+                except BaseException:
+                    exporter.abort()
+                    raise
+
+                pending_close = executor.submit(exporter.close)
+
+        if pending_close is not None:
+            pending_close.result()
 
     def download(
         self,
@@ -198,4 +219,6 @@ class MangaLoader:
         manga_list = self._normalize_ids(
             title_ids, chapter_ids, min_chapter, max_chapter, last_chapter
         )
-        self._download(manga_list)
+        # Exporters write their output on close(), which is cpu heavy for pdf
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            self._download(manga_list, executor)
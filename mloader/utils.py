@@ -2,18 +2,25 @@ import re
 import string
 from typing import Optional
 
+_BLACKLIST_TABLE = str.maketrans('', '', '~`!@$^*\\【】')
+_BRACKET_RE = re.compile(r'\((.*?)\)|\[(.*?)\]|\{(.*?)\}')
+# "one" and "shot" in any order, ASCII only to match str.lower() semantics
+_ONESHOT_RE = re.compile(
+    r"one.*shot|shot.*one", re.IGNORECASE | re.ASCII | re.DOTALL
+)
+
 
 def is_oneshot(chapter_name: str, chapter_subtitle: str) -> bool:
-    for name in (chapter_name, chapter_subtitle):
-        name = name.lower()
-        if "one" in name and "shot" in name:
-            return True
-    return False
+    return bool(
+        _ONESHOT_RE.search(chapter_name) or _ONESHOT_RE.search(chapter_subtitle)
+    )
 
 
 def chapter_name_to_int(name: str) -> Optional[int]:
+    if name.startswith("#"):
+        name = name.lstrip("#")
     try:
-        return int(name.lstrip("#"))
+        return int(name)
     except ValueError:
         return None
 
@@ -23,17 +30,15 @@ def bracket_match_capitalize(match):
     return match.group(0).capitalize()
 
 
+def _format_word(word: str) -> str:
+    # Capitalize first characters inside enclosing brackets
+    word = _BRACKET_RE.sub(bracket_match_capitalize, word)
+    # Capitalize word if has apostrophe, else make Title case
+    return word.capitalize() if "'" in word else word.title()
+
+
 def beautify_path(path: str) -> str:
     # Remove/Replace some blacklisted characters
-    clean_str = re.sub(r'[~`!@$^*\\【】]', '', path).replace(': ', " - ").replace(':', "-").replace("/", " of ")
-    # Convert everything to list of items
-    clean_list = re.findall(r"([\S]+)+", clean_str, re.IGNORECASE | re.MULTILINE | re.DOTALL)
-    result = []
-    for item in clean_list:
-        # Capitalize first characters inside enclosing brackets
-        item = re.sub(r'\((.*?)\)|\[(.*?)\]|\{(.*?)\}', bracket_match_capitalize, item)
-        # Capitalize word if has apostrophe, else make Title case
-        item = ' '.join(word.capitalize() if "'" in word else word.title() for word in item.split())
-        result.append(item)
-    # Put back the newly formatted items as string
-    return ' '.join(result)
+    clean_str = path.translate(_BLACKLIST_TABLE).replace(': ', " - ").replace(':', "-").replace("/", " of ")
+    # Format every whitespace separated word, join them with single spaces
+    return ' '.join(map(_format_word, clean_str.split()))